@@ -1,6 +1,21 @@
 import bpy
 import bmesh
 import os
+import contextlib
+import numpy as np
+
+# samples per bake pass. normal/roughness are plain surface attributes so one
+# sample is enough, diffuse gets a few more for edge antialiasing
+BAKE_SAMPLES = {
+    'DIFFUSE': 64,
+    'NORMAL': 1,
+    'ROUGHNESS': 1,
+}
+
+# tinyrenderer only reads TGA, so that stays the default. set this to write PNG
+# straight out of blender when you just want to look at the bakes, skipping
+# the tga2png.py round trip
+SAVE_PNG_DIRECT = False
 
 def check_and_fix_uvs():
     """Check if object has UVs and create them if missing"""
@@ -16,14 +31,15 @@ def check_and_fix_uvs():
     if not obj.data.uv_layers:
         print("❌ No UV map found. Creating Smart UV Project...")
         
-        # Enter edit mode
-        bpy.context.view_layer.objects.active = obj
-        bpy.ops.object.mode_set(mode='EDIT')
-        
-        # Select all
-        bpy.ops.mesh.select_all(action='SELECT')
+        # Select all directly on the mesh data, edit mode picks the selection
+        # up when it loads the mesh so no extra select_all op is needed
+        me = obj.data
+        me.vertices.foreach_set('select', np.ones(len(me.vertices), dtype=bool))
+        me.edges.foreach_set('select', np.ones(len(me.edges), dtype=bool))
+        me.polygons.foreach_set('select', np.ones(len(me.polygons), dtype=bool))
         
-        # Smart UV Project
+        # Smart UV Project only runs in edit mode, so this is the one toggle left
+        bpy.ops.object.mode_set(mode='EDIT')
         bpy.ops.uv.smart_project(angle_limit=1.15192, island_margin=0.02)
         
         # Back to object mode
@@ -35,12 +51,55 @@ def check_and_fix_uvs():
         
     return True
 
-def bake_and_save_tga(bake_type, filename_suffix):
-    """Bake texture and save as TGA"""
+def setup_gpu_device():
+    """Point Cycles at the best available GPU backend, falls back to CPU if none found.
+    returns the previous settings for restore_gpu_device"""
+    prefs = bpy.context.preferences.addons['cycles'].preferences
+    scene = bpy.context.scene
     
-    print(f"\n🔥 Starting bake: {bake_type}")
+    # these are the user's global preferences, keep them so they can be put
+    # back after and don't get saved with our changes
+    saved = (prefs.compute_device_type,
+             {d.id: d.use for d in prefs.devices},
+             scene.cycles.device)
     
-    obj = bpy.context.active_object
+    # try backends in order of preference, first one that actually has a device wins
+    found = None
+    for device_type in ('OPTIX', 'CUDA', 'HIP', 'ONEAPI', 'METAL'):
+        try:
+            prefs.compute_device_type = device_type
+        except TypeError:
+            # older blender versions don't know about some of these
+            continue
+        prefs.refresh_devices()
+        if any(d.type == device_type for d in prefs.devices):
+            found = device_type
+            break
+    
+    if found is None:
+        scene.cycles.device = 'CPU'
+        print("⚠️  No GPU found, baking on CPU")
+        return saved
+    
+    for d in prefs.devices:
+        d.use = (d.type != 'CPU')
+    scene.cycles.device = 'GPU'
+    print(f"🖥️  Baking on GPU ({found})")
+    return saved
+
+def restore_gpu_device(saved):
+    """Put back the device settings returned by setup_gpu_device"""
+    prefs = bpy.context.preferences.addons['cycles'].preferences
+    compute_device_type, device_use, scene_device = saved
+    
+    prefs.compute_device_type = compute_device_type
+    for d in prefs.devices:
+        if d.id in device_use:
+            d.use = device_use[d.id]
+    bpy.context.scene.cycles.device = scene_device
+
+def add_bake_node(obj):
+    """Add the image texture node that all bakes for this object write into"""
     
     # Ensure object has a material
     if not obj.data.materials:
@@ -57,18 +116,67 @@ def bake_and_save_tga(bake_type, filename_suffix):
     
     nodes = mat.node_tree.nodes
     
-    # Create new image
-    img = bpy.data.images.new(f"baked_{bake_type}", 1024, 1024)
-    print(f"📷 Created 1024x1024 image: baked_{bake_type}")
-    
-    # Add image texture node
+    # Add image texture node, only the image gets swapped between bakes so
+    # the material itself stays the same for every pass
     img_node = nodes.new('ShaderNodeTexImage')
-    img_node.image = img
     img_node.select = True
     nodes.active = img_node
     
-    # Set render engine to Cycles (required for baking)
-    bpy.context.scene.render.engine = 'CYCLES'
+    return img_node
+
+def check_bake_result(img, bake_type):
+    """Print per channel range of a baked image and warn if a diffuse bake came out flat"""
+    # copy all pixels out in one foreach_get, indexing img.pixels from python
+    # marshals every single float
+    px = np.empty(img.size[0] * img.size[1] * img.channels, dtype=np.float32)
+    img.pixels.foreach_get(px)
+    px = px.reshape(-1, img.channels)
+    
+    lo = px.min(axis=0)
+    hi = px.max(axis=0)
+    print(f"📊 {bake_type} range: min {np.round(lo, 3).tolist()} max {np.round(hi, 3).tolist()}")
+    
+    # a flat diffuse bake usually means the material or uvs didn't give cycles
+    # anything to bake. normal/roughness can legitimately be flat (planar mesh,
+    # constant roughness) so those only get the range printed
+    if bake_type == 'DIFFUSE' and np.all(hi - lo == 0.0):
+        print(f"⚠️  {bake_type} bake is a single flat color, check the material and UVs")
+
+def bake_context(obj):
+    """Pin the bake context to obj so the bakes don't depend on the ui selection"""
+    scene = bpy.context.scene
+    
+    # temp_override only exists in blender 3.2+, older ones just bake with
+    # whatever the current context is
+    if not hasattr(bpy.context, 'temp_override'):
+        return contextlib.nullcontext()
+    
+    return bpy.context.temp_override(
+        scene=scene,
+        view_layer=bpy.context.view_layer,
+        object=obj,
+        active_object=obj,
+        selected_objects=[obj],
+        selected_editable_objects=[obj],
+    )
+
+def bake_and_save_tga(bake_type, filename_suffix, img_node, save_folder):
+    """Bake texture and save as TGA, or as PNG when SAVE_PNG_DIRECT is set"""
+    
+    print(f"\n🔥 Starting bake: {bake_type}")
+    
+    obj = bpy.context.active_object
+    
+    # Create new image, 8 bit rgb since that's all the tga/png output holds anyway
+    img = bpy.data.images.new(f"baked_{bake_type}", 1024, 1024, alpha=False, float_buffer=False)
+    if bake_type in ('NORMAL', 'ROUGHNESS'):
+        # these are data not colors, store them as is without the srgb transform
+        img.colorspace_settings.name = 'Non-Color'
+    print(f"📷 Created 1024x1024 image: baked_{bake_type}")
+    
+    img_node.image = img
+    
+    bpy.context.scene.cycles.samples = BAKE_SAMPLES[bake_type]
     
     print(f"⚙️  Bake settings configured for {bake_type}")
     
@@ -83,27 +191,46 @@ def bake_and_save_tga(bake_type, filename_suffix):
     elif bake_type == 'ROUGHNESS':
         bpy.ops.object.bake(type='ROUGHNESS')
     
-    # vustom save folder rn
-    save_folder = r"C:\Users\gjin3\Desktop\tinyrenderer\obj"
-    
-    # Create the folder if it doesn't exist
-    if not os.path.exists(save_folder):
-        os.makedirs(save_folder)
-        print(f"📁 Created directory: {save_folder}")
-    
-    # Save as TGA
-    filename = f"{obj.name}{filename_suffix}.tga"
+    # Save as TGA, or PNG if asked for
+    ext, fmt = ('png', 'PNG') if SAVE_PNG_DIRECT else ('tga', 'TARGA')
+    filename = f"{obj.name}{filename_suffix}.{ext}"
     filepath = os.path.join(save_folder, filename)
     
     img.filepath_raw = filepath
-    img.file_format = 'TARGA'
+    img.file_format = fmt
     img.save()
     
     print(f"💾 SAVED: {filepath}")
+    
+    # only a diagnostic, runs after the save and never fails the bake
+    try:
+        check_bake_result(img, bake_type)
+    except Exception as e:
+        print(f"⚠️  Couldn't check {bake_type} bake result: {e}")
+    
     return filepath
 
-def main():
-    """Main function to bake all textures"""
+@contextlib.contextmanager
+def undo_and_autosave_disabled():
+    """Turn off undo history and autosave for the duration of the block"""
+    edit = bpy.context.preferences.edit
+    filepaths = bpy.context.preferences.filepaths
+    saved = (edit.use_global_undo, edit.undo_steps, filepaths.use_auto_save_temporary_files)
+    
+    # every bpy.ops call pushes an undo step otherwise, which adds up over
+    # all the mode toggles and bakes
+    edit.use_global_undo = False
+    edit.undo_steps = 0
+    filepaths.use_auto_save_temporary_files = False
+    try:
+        yield
+    finally:
+        # put the user's preferences back so an interactive session isn't left
+        # without undo (and so they don't get saved that way)
+        edit.use_global_undo, edit.undo_steps, filepaths.use_auto_save_temporary_files = saved
+
+def bake_active_object():
+    """Bake all textures for the active object"""
     print("=" * 50)
     print("🚀 STARTING TEXTURE BAKING PROCESS")
     print("=" * 50)
@@ -120,13 +247,44 @@ def main():
     if not check_and_fix_uvs():
         return
     
+    # Set render engine to Cycles (required for baking), once for all bakes
+    bpy.context.scene.render.engine = 'CYCLES'
+    
+    # vustom save folder rn
+    save_folder = r"C:\Users\gjin3\Desktop\tinyrenderer\obj"
+    
     print("\n🎯 Starting texture baking...")
     
-    # Bake all three texture types
+    # bake works on the selection, select the object directly instead of
+    # going through bpy.ops.object.select_all
+    obj = bpy.context.active_object
+    obj.select_set(True)
+    
+    # anything set up inside the try gets undone in the finally, None means
+    # it never got that far
+    scene = bpy.context.scene
+    saved_samples = None
+    saved_device = None
+    img_node = None
+    
     try:
-        diffuse_path = bake_and_save_tga('DIFFUSE', '_diffuse')
-        normal_path = bake_and_save_tga('NORMAL', '_nm') 
-        spec_path = bake_and_save_tga('ROUGHNESS', '_spec')
+        # bake passes set their own sample count, keep the user's to put back after
+        saved_samples = scene.cycles.samples
+        
+        # configure compute device once, not per bake
+        saved_device = setup_gpu_device()
+        
+        # Create the folder if it doesn't exist
+        if not os.path.exists(save_folder):
+            os.makedirs(save_folder)
+            print(f"📁 Created directory: {save_folder}")
+        
+        # Bake all three texture types back to back into the same node
+        img_node = add_bake_node(obj)
+        with bake_context(obj):
+            diffuse_path = bake_and_save_tga('DIFFUSE', '_diffuse', img_node, save_folder)
+            normal_path = bake_and_save_tga('NORMAL', '_nm', img_node, save_folder)
+            spec_path = bake_and_save_tga('ROUGHNESS', '_spec', img_node, save_folder)
         
         print("\n" + "=" * 50)
         print("🎉 SUCCESS! All textures baked:")
@@ -138,6 +296,21 @@ def main():
     except Exception as e:
         print(f"❌ ERROR during baking: {str(e)}")
         print("   Make sure your object is a mesh and has proper geometry")
+    
+    finally:
+        # done with this object, drop the bake node again and leave the
+        # scene's render settings how we found them
+        if img_node is not None:
+            img_node.id_data.nodes.remove(img_node)
+        if saved_samples is not None:
+            scene.cycles.samples = saved_samples
+        if saved_device is not None:
+            restore_gpu_device(saved_device)
+
+def main():
+    """Main function to bake all textures"""
+    with undo_and_autosave_disabled():
+        bake_active_object()
 
 # Run the main function
 if __name__ == "__main__":
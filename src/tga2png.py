@@ -7,9 +7,60 @@ manually parse tga file to python so we can view it like a normal person
 import sys
 import os
 import struct
+import mmap
+import concurrent.futures
+import functools
 from PIL import Image
 import argparse
 
+# numpy is optional, only used to speed up the manual parsing path
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# numba is optional too, if it's there the RLE decoding runs compiled. it is
+# only imported and compiled the first time an RLE file hits the manual path,
+# so the normal PIL path doesn't pay for it. None means not tried yet, False
+# means numba (or numpy) isn't available
+_rle_decoder = None
+
+def _decode_rle(buf, pos, bpp, pixel_count, out):
+    """decode RLE packets from buf starting at pos into out, returns the
+    number of pixels decoded (less than pixel_count if buf ran out). plain
+    python here, read_rle_data compiles it with numba on first use"""
+    pixels_read = 0
+    end = len(buf)
+    
+    while pixels_read < pixel_count:
+        if pos >= end:
+            return pixels_read
+        packet_header = buf[pos]
+        pos += 1
+        # runs that go past the last pixel get clipped
+        run_length = min((packet_header & 0x7F) + 1, pixel_count - pixels_read)
+    
+        if packet_header & 0x80:  # RLE packet
+            if pos + bpp > end:
+                return pixels_read
+            o = pixels_read * bpp
+            for _ in range(run_length):
+                for c in range(bpp):
+                    out[o + c] = buf[pos + c]
+                o += bpp
+            pos += bpp
+        else:  # Raw packet
+            n = ((packet_header & 0x7F) + 1) * bpp
+            if pos + n > end:
+                return pixels_read
+            o = pixels_read * bpp
+            for i in range(run_length * bpp):
+                out[o + i] = buf[pos + i]
+            pos += n
+        pixels_read += run_length
+    
+    return pixels_read
+
 class TGAReader:
     def __init__(self, filepath):
         self.filepath = filepath
@@ -50,55 +101,88 @@ class TGAReader:
         
     def read_image_data(self, f):
         """Read the actual image pixel data"""
+        # walk everything after the header with an offset instead of lots of
+        # small f.read calls. an mmap can be viewed directly with no copy,
+        # a normal file gets read in one go
+        try:
+            mv = memoryview(f)[f.tell():]
+        except TypeError:
+            mv = memoryview(f.read())
+        pos = 0
+        
         # skip id field if it is present 
         if self.header['id_length'] > 0:
-            f.read(self.header['id_length'])
+            pos += self.header['id_length']
             
         # skip colormap if present
         if self.header['colormap_type'] == 1:
             colormap_size = self.header['colormap_length'] * (self.header['colormap_depth'] // 8)
-            f.read(colormap_size)
+            pos += colormap_size
         
         image_type = self.header['image_type']
         pixel_count = self.width * self.height
         
         if image_type in [2, 3]:  # it is uncompresseed rbg, or it is colorscale
             expected_size = pixel_count * self.bpp
-            self.image_data = f.read(expected_size)
+            self.image_data = mv[pos:pos + expected_size]
             if len(self.image_data) < expected_size:
                 raise ValueError(f"Not enough image data: got {len(self.image_data)}, expected {expected_size}")
                 
         elif image_type in [10, 11]:  # RLE compressed
-            self.image_data = self.read_rle_data(f, pixel_count)
+            self.image_data = self.read_rle_data(mv, pos, pixel_count)
         else:
             raise ValueError(f"Unsupported TGA image type: {image_type}")
     
-    def read_rle_data(self, f, pixel_count):
-        """Read RLE compressed image data"""
-        data = bytearray()
+    def read_rle_data(self, mv, pos, pixel_count):
+        """Read RLE compressed image data from mv starting at pos"""
+        global _rle_decoder
+        if _rle_decoder is None:
+            try:
+                import numba
+                _rle_decoder = numba.njit(cache=True)(_decode_rle) if np is not None else False
+            except ImportError:
+                _rle_decoder = False
+        
+        if _rle_decoder:
+            # hand the rest of the buffer to the compiled decoder in one go
+            buf = np.frombuffer(mv, dtype=np.uint8)
+            data = np.empty(pixel_count * self.bpp, dtype=np.uint8)
+            if _rle_decoder(buf, pos, self.bpp, pixel_count, data) < pixel_count:
+                raise ValueError("unexpected end of file in RLE data")
+            return data
+        
+        # final size is known up front so fill a preallocated buffer instead of
+        # growing one with extend
+        data = bytearray(pixel_count * self.bpp)
+        out = 0
         pixels_read = 0
+        end = len(mv)
         
         while pixels_read < pixel_count:
-            try:
-                packet_header = f.read(1)[0]
-            except:
+            if pos >= end:
                 raise ValueError("unexpected end of file in RLE data")
+            packet_header = mv[pos]
+            pos += 1
+            run_length = (packet_header & 0x7F) + 1
+            # runs that go past the last pixel get clipped, otherwise the
+            # slice assignments below would grow the buffer
+            pixels_used = min(run_length, pixel_count - pixels_read)
+            n = pixels_used * self.bpp
                 
             if packet_header & 0x80:  # RLE packet
-                run_length = (packet_header & 0x7F) + 1
-                pixel_data = f.read(self.bpp)
+                pixel_data = mv[pos:pos + self.bpp]
                 if len(pixel_data) < self.bpp:
                     raise ValueError("unexpected end of file in RLE pixel data")
-                for _ in range(run_length):
-                    data.extend(pixel_data)
-                pixels_read += run_length
+                pos += self.bpp
+                data[out:out + n] = bytes(pixel_data) * pixels_used
             else:  # Raw packet
-                run_length = (packet_header & 0x7F) + 1
-                pixel_data = f.read(run_length * self.bpp)
+                pixel_data = mv[pos:pos + run_length * self.bpp]
                 if len(pixel_data) < run_length * self.bpp:
                     raise ValueError("unexpected end of file in raw pixel data")
-                data.extend(pixel_data)
-                pixels_read += run_length
+                pos += run_length * self.bpp
+                data[out:out + n] = pixel_data[:n]
+            out += n
+            pixels_read += pixels_used
                 
         return bytes(data)
     
@@ -108,21 +192,38 @@ class TGAReader:
             raise ValueError("no image data loaded")
             
         # Convert BGR(A) to RGB(A) format for PIL
-        if self.bpp == 3:  # RGB
-            # TGA stores as BGR, convert to RGB
-            rgb_data = bytearray()
-            for i in range(0, len(self.image_data), 3):
-                b, g, r = self.image_data[i:i+3]
-                rgb_data.extend([r, g, b])
+        if self.bpp in (3, 4) and np is not None:
+            # reorder the channels of the whole buffer at once instead of per pixel
+            pixels = np.frombuffer(self.image_data, dtype=np.uint8,
+                                   count=self.width * self.height * self.bpp)
+            pixels = pixels.reshape(self.height, self.width, self.bpp)
+            if self.bpp == 3:  # RGB
+                mode = 'RGB'
+                data = pixels[..., ::-1].tobytes()
+            else:  # RGBA
+                mode = 'RGBA'
+                data = pixels[..., [2, 1, 0, 3]].tobytes()
+            
+        elif self.bpp == 3:  # RGB
+            # TGA stores as BGR, convert to RGB. no numpy here so swap the
+            # channels with extended slices into a preallocated buffer, that
+            # still runs in C instead of once per pixel
+            d = bytes(self.image_data)
+            rgb_data = bytearray(len(d))
+            rgb_data[0::3] = d[2::3]
+            rgb_data[1::3] = d[1::3]
+            rgb_data[2::3] = d[0::3]
             mode = 'RGB'
             data = bytes(rgb_data)
             
         elif self.bpp == 4:  # RGBA
             # TGA stores as BGRA, convert to RGBA
-            rgba_data = bytearray()
-            for i in range(0, len(self.image_data), 4):
-                b, g, r, a = self.image_data[i:i+4]
-                rgba_data.extend([r, g, b, a])
+            d = bytes(self.image_data)
+            rgba_data = bytearray(len(d))
+            rgba_data[0::4] = d[2::4]
+            rgba_data[1::4] = d[1::4]
+            rgba_data[2::4] = d[0::4]
+            rgba_data[3::4] = d[3::4]
             mode = 'RGBA'
             data = bytes(rgba_data)
             
@@ -144,9 +245,10 @@ class TGAReader:
         return img
 
 # if pil fails because of skill issue, we will just do skill issue
-def convert_tga_to_png_robust(tga_path, png_path=None):
+def convert_tga_to_png_robust(tga_path, png_path=None, compress_level=1):
     """
     Convert TGA to PNG using manual TGA parsing for better compatibility.
+    compress_level is the PNG zlib level (0-9), low is faster but bigger.
     """
     try:
         #crete the output path if ot specified
@@ -154,10 +256,15 @@ def convert_tga_to_png_robust(tga_path, png_path=None):
             base_name = os.path.splitext(tga_path)[0]
             png_path = f"{base_name}.png"
         
-        # try faster pil first
+        # try faster pil first, its tga plugin does rle and the bgr swap in C
         try:
             with Image.open(tga_path) as img:
-                img.save(png_path, "PNG")
+                # decode fully before touching png_path so a broken tga fails
+                # here and not halfway through writing the png
+                img.load()
+                # low zlib level by default, these are intermediate textures
+                # so encode speed matters more than file size
+                img.save(png_path, "PNG", optimize=False, compress_level=compress_level)
                 print(f"Converted (PIL): {tga_path} → {png_path}")
                 return png_path
         except Exception as pil_error:
@@ -167,12 +274,22 @@ def convert_tga_to_png_robust(tga_path, png_path=None):
         reader = TGAReader(tga_path)
         
         with open(tga_path, 'rb') as f:
-            reader.read_header(f)
-            reader.read_image_data(f)
+            # map the file so the pixel data is a view straight into the page
+            # cache. the mapping isn't closed explicitly since views into it can
+            # outlive this block (e.g. held by a traceback), it gets unmapped
+            # once the last one is gone
+            # an empty file can't be mapped, anything shorter than the header
+            # goes through the plain file so the reader reports it properly
+            if os.fstat(f.fileno()).st_size < 18:
+                src = f
+            else:
+                src = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            reader.read_header(src)
+            reader.read_image_data(src)
         
         # convert to PIL Image and save
         img = reader.to_pil_image()
-        img.save(png_path, "PNG")
+        img.save(png_path, "PNG", optimize=False, compress_level=compress_level)
         
         print(f"onverted (manual): {tga_path} → {png_path}")
         return png_path
@@ -187,6 +304,9 @@ def main():
     parser.add_argument("-o", "--output", help="Output PNG file (for single file conversion)")
     parser.add_argument("-r", "--recursive", action="store_true", 
                        help="Recursively convert all TGA files in directory")
+    parser.add_argument("-c", "--compress", type=int, default=1, choices=range(10),
+                       metavar="0-9",
+                       help="PNG zlib compression level, higher is smaller but slower (default: 1)")
     parser.add_argument("-v", "--verbose", action="store_true",
                        help="Verbose output")
     
@@ -205,7 +325,7 @@ def main():
             print("cringe input file must have .tga extension")
             sys.exit(1)
         
-        result = convert_tga_to_png_robust(input_path, args.output)
+        result = convert_tga_to_png_robust(input_path, args.output, args.compress)
         if result:
             print("this shit works")
         else:
@@ -233,10 +353,15 @@ def main():
         
         print(f"Found {len(tga_files)} TGA file(s)")
         
-        successful = 0
-        for tga_file in tga_files:
-            if convert_tga_to_png_robust(tga_file):
-                successful += 1
+        # every file is independent so convert them in parallel, processes
+        # rather than threads since the swizzle/zlib work is cpu bound
+        convert = functools.partial(convert_tga_to_png_robust, compress_level=args.compress)
+        with concurrent.futures.ProcessPoolExecutor() as ex:
+            successful = sum(1 for r in ex.map(convert, tga_files) if r)
+        
+        print(f"Converted {successful}/{len(tga_files)} TGA file(s)")
+        if successful < len(tga_files):
+            sys.exit(1)
 
 if __name__ == "__main__":
     # for no arguments
@@ -247,8 +372,10 @@ if __name__ == "__main__":
         print("  python tga2png.py output.tga -o myimage.png     # Convert with custom output name") 
         print("  python tga2png.py ./images/                     # Convert all TGA files in directory")
         print("  python tga2png.py ./project/ -r                 # Convert all TGA files recursively")
+        print("  python tga2png.py ./images/ -c 9                # Smaller PNGs, slower encode")
         print("  python tga2png.py output.tga -v                 # Verbose output")
         print("\nRequired: pip install Pillow")
+        print("Optional: pip install numpy numba      # faster manual parsing")
         sys.exit(0)
     
     main()
\ No newline at end of file